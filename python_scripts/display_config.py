@@ -11,15 +11,22 @@
 # Safe for isolated networks with up to 250 Raspberry Pis.
 # ---------------------------------------------------------------------------------------------------
 
+import asyncio
+import io
+import logging
+import logging.handlers
 import os
+import queue
 import socket
-import platform
+import struct
+import sys
+import shlex
 import ipaddress
-import subprocess
+import tarfile
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import paramiko
-from scp import SCPClient
+import asyncssh
+from icmplib import ICMPLibError, ICMPv4Socket, SocketPermissionError, async_multiping
 
 # ---------------------------
 # USER CONFIGURATION
@@ -36,10 +43,23 @@ SSH_KEY_PATH = '/home/pi/.ssh/id_rsa'
 EXCLUDE_IPS = []
 
 MAX_PARALLEL_TASKS = 250
+# Caps simultaneous SSH key exchanges/authentications across all devices to bound this
+# machine's CPU burst. TCP connects happen before a slot is taken, so dead hosts never hold one.
+MAX_CONCURRENT_HANDSHAKES = 30
+SSH_PORT = 22
+CONNECT_TIMEOUT = 10  # seconds, for the TCP connect and again for the SSH handshake
 LOG_DIR = "/home/phason/Logs"
 DETAILED_LOG = os.path.join(LOG_DIR, "detailed_log.txt")
 ERROR_LOG = os.path.join(LOG_DIR, "error_log.txt")
 
+# Devices reached on the last run; reused instead of a network scan while fresh
+KNOWN_HOSTS_CACHE = os.path.join(LOG_DIR, "hosts.cache")
+KNOWN_HOSTS_MAX_AGE = 24 * 60 * 60  # seconds
+
+# Device host keys, collected once with ssh-keyscan; connections to unknown or changed keys are rejected.
+# Delete a device's line here after reimaging it.
+SSH_KNOWN_HOSTS = os.path.join(LOG_DIR, "deploy_known_hosts")
+
 # ---------------------------
 # LOGGING UTILITIES
 # ---------------------------
@@ -66,13 +86,64 @@ def ensure_log_dir():
     """Ensure log directory exists."""
     os.makedirs(LOG_DIR, exist_ok=True)
 
+def create_queue_logger(name, path):
+    """Create a logger whose records are written to path by a background listener thread."""
+    file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    return logger, logging.handlers.QueueListener(log_queue, file_handler)
+
+detail_logger, detail_listener = create_queue_logger("detail", DETAILED_LOG)
+err_logger, err_listener = create_queue_logger("error", ERROR_LOG)
+
 def log_message(msg, error=False):
-    """Append a message to the appropriate log file."""
+    """Queue a message for the appropriate log file."""
+    (err_logger if error else detail_logger).info(msg)
+
+# Console progress goes through one writer thread that batches stdout writes
+PROGRESS_Q = queue.SimpleQueue()
+PROGRESS_BATCH = 64
+
+def _drain_progress():
+    """Write queued progress messages to stdout in batches until the None sentinel arrives."""
+    while True:
+        batch = [PROGRESS_Q.get()]
+        while len(batch) < PROGRESS_BATCH:
+            try:
+                batch.append(PROGRESS_Q.get_nowait())
+            except queue.Empty:
+                break
+        done = None in batch
+        messages = [msg for msg in batch if msg is not None]
+        if messages:
+            sys.stdout.write("\n".join(messages) + "\n")
+            sys.stdout.flush()
+        if done:
+            return
+
+progress_writer = threading.Thread(target=_drain_progress, daemon=True)
+
+def progress(msg):
+    """Queue a message for the console."""
+    PROGRESS_Q.put(msg)
+
+def start_logging():
+    """Ensure log directory exists and start the log and console writer threads."""
     ensure_log_dir()
-    timestamp = time.strftime("[%Y-%m-%d %H:%M:%S]")
-    target_file = ERROR_LOG if error else DETAILED_LOG
-    with open(target_file, "a") as f:
-        f.write(f"{timestamp} {msg}\n")
+    detail_listener.start()
+    err_listener.start()
+    progress_writer.start()
+
+def stop_logging():
+    """Flush pending log records and console output and stop the writer threads."""
+    detail_listener.stop()
+    err_listener.stop()
+    PROGRESS_Q.put(None)
+    progress_writer.join()
 
 # ---------------------------
 # NETWORK FUNCTIONS
@@ -86,167 +157,336 @@ def get_local_ip():
     finally:
         s.close()
 
-def get_gateway_ip():
+RTF_GATEWAY = 0x2  # route flag: destination is reached through a gateway
+
+def get_gateway_ip(route_table="/proc/net/route"):
+    """Read the default gateway straight from the kernel routing table."""
     try:
-        output = subprocess.check_output("ip route", shell=True).decode()
-        for line in output.splitlines():
-            if line.startswith("default"):
-                return line.split()[2]
-    except:
+        with open(route_table) as f:
+            next(f)  # skip header
+            for line in f:
+                fields = line.strip().split("\t")
+                if (len(fields) > 7 and fields[1] == "00000000" and fields[7] == "00000000"
+                        and int(fields[3], 16) & RTF_GATEWAY):
+                    return socket.inet_ntoa(struct.pack("<L", int(fields[2], 16)))
+    except (OSError, ValueError, StopIteration):
         return None
     return None
 
-def ping_ip(ip):
-    param = "-n" if platform.system().lower() == "windows" else "-c"
-    timeout = "-w" if platform.system().lower() == "windows" else "-W"
+def icmp_privileged_mode():
+    """Return the icmplib privileged flag this host allows, or None if ICMP sockets are unavailable.
+
+    Unprivileged sockets need net.ipv4.ping_group_range to include our group; raw sockets need root.
+    """
+    for privileged in (False, True):
+        try:
+            ICMPv4Socket(privileged=privileged).close()
+            return privileged
+        except SocketPermissionError:
+            continue
+    return None
+
+def abort_scan(reason):
+    """Report why the network scan cannot run and stop the deployment."""
+    msg = f"❌ Network scan failed: {reason}. Aborting deployment."
+    progress(msg); log_message(msg, error=True)
+    raise SystemExit(msg)
+
+async def scan_active_ips(addresses, concurrent_tasks):
+    """Ping addresses (pulled lazily from any iterable) concurrently and return the live ones."""
+    privileged = icmp_privileged_mode()
+    if privileged is None:
+        abort_scan(
+            "ICMP sockets are not permitted. Run as root/administrator or allow unprivileged ping "
+            "with: sudo sysctl -w net.ipv4.ping_group_range=\"0 2147483647\""
+        )
     try:
-        result = subprocess.run(
-            ["ping", param, "1", timeout, "1", ip],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+        hosts = await async_multiping(
+            addresses, count=1, timeout=1, concurrent_tasks=concurrent_tasks, privileged=privileged
         )
-        if result.returncode == 0:
-            return ip
-    except:
-        pass
-    return None
+    except ICMPLibError as e:
+        abort_scan(e)
+    return [host.address for host in hosts if host.is_alive]
+
+def load_cached_hosts():
+    """Return the IPs from the last run if the cache exists and is fresh, else None."""
+    try:
+        if time.time() - os.path.getmtime(KNOWN_HOSTS_CACHE) > KNOWN_HOSTS_MAX_AGE:
+            return None
+        with open(KNOWN_HOSTS_CACHE) as f:
+            return [line.strip() for line in f if line.strip()] or None
+    except OSError:
+        return None
+
+def save_cached_hosts(ips):
+    """Record the devices reached after a network sweep, or drop the cache if none were."""
+    try:
+        if ips:
+            with open(KNOWN_HOSTS_CACHE, "w") as f:
+                f.write("\n".join(ips) + "\n")
+        elif os.path.exists(KNOWN_HOSTS_CACHE):
+            os.remove(KNOWN_HOSTS_CACHE)
+    except OSError as e:
+        log_message(f"Could not update host cache: {e}", error=True)
 
 # ---------------------------
 # SSH / SCP FUNCTIONS
 # ---------------------------
 
-def create_ssh_client(host, user, password=None, key_path=None):
-    """Create SSH client with timeouts tuned for mass parallel connections."""
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    if key_path:
-        key = paramiko.RSAKey.from_private_key_file(key_path)
-        client.connect(
-            hostname=host, username=user, pkey=key,
-            timeout=10, banner_timeout=10, auth_timeout=10
-        )
-    else:
-        client.connect(
-            hostname=host, username=user, password=password,
-            timeout=10, banner_timeout=10, auth_timeout=10
-        )
-    return client
+def _build_tar(local_dir, filenames):
+    """Archive the given files from local_dir into an in-memory tar and return its bytes."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for filename in filenames:
+            tar.add(os.path.join(local_dir, filename), arcname=filename)
+    return buf.getvalue()
+
+async def update_known_hosts(ips):
+    """Append the ed25519 host keys of devices missing from SSH_KNOWN_HOSTS, scanned in one ssh-keyscan run.
+
+    Returns True if any keys were added.
+    """
+    known = set()
+    if os.path.exists(SSH_KNOWN_HOSTS):
+        with open(SSH_KNOWN_HOSTS) as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    known.update(line.split()[0].split(","))
+
+    missing = [ip for ip in ips if ip not in known]
+    if not missing:
+        return False
 
-def send_files_and_execute(ip):
-    """Copy files, execute script, and clean up after success."""
     try:
-        print(f"[→] {ip}: Connecting...")
-        ssh_client = create_ssh_client(
-            ip, REMOTE_USER,
-            key_path=SSH_KEY_PATH if USE_SSH_KEY else None,
-            password=None if USE_SSH_KEY else REMOTE_PASSWORD
+        proc = await asyncio.create_subprocess_exec(
+            "ssh-keyscan", "-T", "2", "-t", "ed25519", *missing,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
         )
-
-        if not os.path.isdir(LOCAL_DIR):
-            msg = f"{ip}: ❌ Local directory '{LOCAL_DIR}' missing. Skipping."
-            print(msg); log_message(msg, error=True)
-            ssh_client.close()
-            return
-
-        # Transfer files
-        transferred_files = []
-        with SCPClient(ssh_client.get_transport()) as scp:
-            for filename in os.listdir(LOCAL_DIR):
-                full_path = os.path.join(LOCAL_DIR, filename)
-                if os.path.isfile(full_path):
-                    scp.put(full_path, remote_path=REMOTE_DIR)
-                    transferred_files.append(filename)
+        keys, _ = await proc.communicate()
+        with open(SSH_KNOWN_HOSTS, "ab") as f:
+            f.write(keys)
+        return bool(keys)
+    except OSError as e:
+        msg = f"❌ Could not collect device host keys into {SSH_KNOWN_HOSTS}: {e}. Aborting deployment."
+        progress(msg); log_message(msg, error=True)
+        raise SystemExit(msg)
+
+def load_known_hosts():
+    """Parse SSH_KNOWN_HOSTS once so every connection shares the same trusted keys."""
+    try:
+        return asyncssh.read_known_hosts(SSH_KNOWN_HOSTS)
+    except (OSError, ValueError) as e:
+        msg = f"❌ Could not read device host keys from {SSH_KNOWN_HOSTS}: {e}. Aborting deployment."
+        progress(msg); log_message(msg, error=True)
+        raise SystemExit(msg)
+
+async def open_tcp(host):
+    """Open a non-blocking TCP connection to the device's sshd."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await asyncio.wait_for(asyncio.get_running_loop().sock_connect(sock, (host, SSH_PORT)), CONNECT_TIMEOUT)
+    except asyncio.TimeoutError:
+        sock.close()
+        raise TimeoutError(f"TCP connect to port {SSH_PORT} timed out") from None
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+def create_ssh_client(host, known_hosts, sock):
+    """Run the SSH handshake over an open socket with timeouts tuned for mass parallel connections."""
+    return asyncssh.connect(
+        host, port=SSH_PORT, sock=sock, username=REMOTE_USER,
+        password=None if USE_SSH_KEY else REMOTE_PASSWORD,
+        client_keys=[SSH_KEY_PATH] if USE_SSH_KEY else [],
+        known_hosts=known_hosts, connect_timeout=CONNECT_TIMEOUT, login_timeout=CONNECT_TIMEOUT
+    )
+
+async def stream_output(ip, process):
+    """Log stdout as it arrives while draining stderr, keeping only its last 64 KiB."""
+    error_tail = ""
+
+    async def drain_stdout():
+        async for line in process.stdout:
+            if line.strip():
+                log_message(f"{ip}: OUTPUT → {line.rstrip()}")
+
+    async def drain_stderr():
+        nonlocal error_tail
+        while chunk := await process.stderr.read(65536):
+            error_tail = (error_tail + chunk)[-65536:]
+
+    await asyncio.gather(drain_stdout(), drain_stderr())
+    await process.wait()
+    return error_tail
+
+async def send_files_and_execute(ip, semaphore, connect_semaphore, payload, transferred_files, known_hosts):
+    """Copy files, execute script, and clean up after success. Returns True if the device was reachable."""
+    reachable = False
+    async with semaphore:
+        try:
+            progress(f"[→] {ip}: Connecting...")
+            # Unreachable devices fail here, before taking a handshake slot
+            sock = await open_tcp(ip)
+            # Only the key exchange and authentication are throttled; authed sessions run free
+            async with connect_semaphore:
+                ssh_client = await create_ssh_client(ip, known_hosts, sock)
+            async with ssh_client:
+                reachable = True
+
+                # Transfer files as a single tar stream
+                await ssh_client.run(
+                    f"tar -x -C {shlex.quote(REMOTE_DIR)}",
+                    input=payload, encoding=None, check=True
+                )
+                for filename in transferred_files:
                     log_message(f"{ip}: Copied {filename}")
 
-        # Ensure script executable
-        ssh_client.exec_command(f"chmod +x {REMOTE_DIR}{TARGET_FILE_TO_RUN}")
+                # Make the script executable, run it and clean up after success in a single channel
+                script_path = shlex.quote(f"{REMOTE_DIR}{TARGET_FILE_TO_RUN}")
+                remote_cmd = f"chmod +x {script_path} && bash {script_path}"
+                if transferred_files:
+                    remote_cmd += " && rm -f " + " ".join(shlex.quote(REMOTE_DIR + f) for f in transferred_files)
+                async with ssh_client.create_process(remote_cmd) as process:
+                    error = (await stream_output(ip, process)).strip()
+
+            if process.exit_status != 0:
+                msg = f"{ip}: ⚠ Script error (exit {process.exit_status}): {error}"
+                progress(msg); log_message(msg, error=True)
+            else:
+                msg = f"{ip}: ✅ Script executed successfully."
+                progress(msg); log_message(msg)
+                for filename in transferred_files:
+                    log_message(f"{ip}: Deleted {filename} after successful execution.")
+                progress(f"[🧹] {ip}: Cleaned up {len(transferred_files)} transferred files.")
+                if error:
+                    log_message(f"{ip}: STDERR → {error}")
+
+        except asyncssh.ProcessError as e:
+            # Only the tar upload runs with check=True; surface the remote reason (missing dir, disk full, ...)
+            reason = (e.stderr or b"").decode(errors="replace").strip()
+            msg = f"{ip}: ❌ File transfer failed (exit {e.exit_status}): {reason}"
+            progress(msg); log_message(msg, error=True)
+        except Exception as e:
+            msg = f"{ip}: ❌ {e}"
+            progress(msg); log_message(msg, error=True)
+
+    return reachable
+
+async def deploy_all(active_ips, payload, transferred_files, known_hosts):
+    """Run send_files_and_execute on every device, capped at MAX_PARALLEL_TASKS connections.
+
+    Returns the IPs of the devices that accepted an SSH connection.
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_TASKS)
+    connect_semaphore = asyncio.Semaphore(MAX_CONCURRENT_HANDSHAKES)
+    results = await asyncio.gather(
+        *(send_files_and_execute(ip, semaphore, connect_semaphore, payload, transferred_files, known_hosts)
+          for ip in active_ips),
+        return_exceptions=True
+    )
+    for ip, result in zip(active_ips, results):
+        if isinstance(result, BaseException):
+            msg = f"❌ Uncaught error on {ip}: {result}"
+            progress(msg); log_message(msg, error=True)
+
+    return [ip for ip, result in zip(active_ips, results) if result is True]
 
-        # Execute the shell script
-        stdin, stdout, stderr = ssh_client.exec_command(f"bash {REMOTE_DIR}{TARGET_FILE_TO_RUN}")
-        output = stdout.read().decode().strip()
-        error = stderr.read().decode().strip()
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
 
-        if error:
-            msg = f"{ip}: ⚠ Script error: {error}"
-            print(msg); log_message(msg, error=True)
-        else:
-            msg = f"{ip}: ✅ Script executed successfully."
-            print(msg); log_message(msg)
+def select_targets(ips, local_ip, gateway_ip):
+    """Drop this machine, the gateway and EXCLUDE_IPS from a list of device IPs."""
+    return [
+        ip for ip in ips
+        if ip != local_ip and ip != gateway_ip and ip not in EXCLUDE_IPS
+    ]
 
-            # 🧹 Cleanup: Delete the transferred files on the remote device
-            for filename in transferred_files:
-                cleanup_cmd = f"rm -f {REMOTE_DIR}{filename}"
-                ssh_client.exec_command(cleanup_cmd)
-                log_message(f"{ip}: Deleted {filename} after successful execution.")
-            print(f"[🧹] {ip}: Cleaned up {len(transferred_files)} transferred files.")
+async def deploy_devices(active_ips, payload, transferred_files, known_hosts):
+    """List the target devices and deploy to them. Returns the IPs that accepted a connection."""
+    progress(f"[+] Found {len(active_ips)} active devices.")
+    for ip in active_ips:
+        progress(f" - {ip}")
 
-        if output:
-            log_message(f"{ip}: OUTPUT → {output}")
+    progress("\n[>] Starting full parallel deployment...\n")
 
-        ssh_client.close()
+    return await deploy_all(active_ips, payload, transferred_files, known_hosts)
 
-    except Exception as e:
-        msg = f"{ip}: ❌ {e}"
-        print(msg); log_message(msg, error=True)
+async def refresh_known_hosts(ips, known_hosts):
+    """Scan keys for devices not yet trusted; re-parse SSH_KNOWN_HOSTS only if it changed."""
+    if await update_known_hosts(ips) or known_hosts is None:
+        return load_known_hosts()
+    return known_hosts
 
-# ---------------------------
-# MAIN EXECUTION
-# ---------------------------
+async def main():
+    if not os.path.isdir(LOCAL_DIR):
+        msg = f"❌ Local directory '{LOCAL_DIR}' missing. Aborting deployment."
+        progress(msg); log_message(msg, error=True)
+        raise SystemExit(f"LOCAL_DIR missing: {LOCAL_DIR}")
 
-def main():
-    ensure_log_dir()
     start_time = time.time()
     local_ip = get_local_ip()
     gateway_ip = get_gateway_ip()
 
-    print("------------------------------------------------------------")
-    print("🔥 Raspberry Pi Mass Deployment (Dual Logging + Auto Cleanup)")
-    print("------------------------------------------------------------")
-    print(f"Local IP:    {local_ip}")
-    print(f"Gateway IP:  {gateway_ip}")
-    print(f"Threads:     {MAX_PARALLEL_TASKS}")
-    print(f"Logs Folder: {LOG_DIR}")
-    print("------------------------------------------------------------")
+    progress("------------------------------------------------------------")
+    progress("🔥 Raspberry Pi Mass Deployment (Dual Logging + Auto Cleanup)")
+    progress("------------------------------------------------------------")
+    progress(f"Local IP:    {local_ip}")
+    progress(f"Gateway IP:  {gateway_ip}")
+    progress(f"Max SSH:     {MAX_PARALLEL_TASKS}")
+    progress(f"Logs Folder: {LOG_DIR}")
+    progress("------------------------------------------------------------")
 
     log_message(f"\n==== Deployment Started at {time.ctime()} ====")
     log_message(f"Local IP: {local_ip}, Gateway: {gateway_ip}")
 
-    network = ipaddress.ip_interface(f"{local_ip}/24").network
-    ip_list = [str(ip) for ip in network.hosts()]
-
-    print("[*] Scanning network for active devices...")
-
-    with ThreadPoolExecutor(max_workers=250) as executor:
-        ping_results = list(executor.map(ping_ip, ip_list))
-
-    active_ips = [
-        ip for ip in ping_results
-        if ip and ip != local_ip and ip != gateway_ip and ip not in EXCLUDE_IPS
+    # Scan and archive the files once; every device shares the same immutable payload
+    transferred_files = [
+        filename for filename in os.listdir(LOCAL_DIR)
+        if os.path.isfile(os.path.join(LOCAL_DIR, filename))
     ]
+    payload = _build_tar(LOCAL_DIR, transferred_files)
+    known_hosts = None
+
+    # Deploy to the devices reached by the last sweep; rescan if any of them is gone
+    cached_ips = select_targets(load_cached_hosts() or [], local_ip, gateway_ip)
+    deployed_ips = []
+    attempted_ips = set(cached_ips)
+    if cached_ips:
+        progress(f"[*] Using {len(cached_ips)} devices cached in {KNOWN_HOSTS_CACHE} (skipping scan)...")
+        known_hosts = await refresh_known_hosts(cached_ips, known_hosts)
+        deployed_ips = await deploy_devices(cached_ips, payload, transferred_files, known_hosts)
+
+    if not cached_ips or len(deployed_ips) < len(cached_ips):
+        if cached_ips:
+            msg = f"[!] {len(cached_ips) - len(deployed_ips)} cached devices unreachable. Rescanning network..."
+            progress(msg); log_message(msg, error=True)
+
+        network = ipaddress.ip_interface(f"{local_ip}/24").network
+        ip_iter = map(str, network.hosts())
+
+        progress("[*] Scanning network for active devices...")
+
+        ping_results = await scan_active_ips(ip_iter, network.num_addresses)
+        active_ips = [ip for ip in select_targets(ping_results, local_ip, gateway_ip) if ip not in deployed_ips]
+
+        if not active_ips and not deployed_ips:
+            progress("❌ No active devices found.")
+            log_message("No active devices found.", error=True)
+            return
 
-    print(f"[+] Found {len(active_ips)} active devices.")
-    for ip in active_ips:
-        print(f" - {ip}")
-
-    if not active_ips:
-        print("❌ No active devices found.")
-        log_message("No active devices found.", error=True)
-        return
-
-    print("\n[>] Starting full parallel deployment...\n")
+        if active_ips:
+            known_hosts = await refresh_known_hosts(active_ips, known_hosts)
+            deployed_ips += await deploy_devices(active_ips, payload, transferred_files, known_hosts)
+            attempted_ips.update(active_ips)
 
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TASKS) as executor:
-        futures = {executor.submit(send_files_and_execute, ip): ip for ip in active_ips}
-        for future in as_completed(futures):
-            ip = futures[future]
-            try:
-                future.result()
-            except Exception as e:
-                msg = f"❌ Uncaught error on {ip}: {e}"
-                print(msg); log_message(msg, error=True)
+        # Only a real sweep refreshes the cache, so its age is the age of the last scan
+        save_cached_hosts(deployed_ips)
 
     total_time = round(time.time() - start_time, 2)
-    print(f"\n✅ Deployment completed for {len(active_ips)} devices in {total_time}s.")
+    progress(f"\n✅ Deployment completed for {len(attempted_ips)} devices in {total_time}s.")
     log_message(f"==== Deployment Finished ({total_time}s) ====")
 
 # ---------------------------
@@ -254,4 +494,8 @@ def main():
 # ---------------------------
 
 if __name__ == "__main__":
-    main()
+    start_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        stop_logging()
@@ -0,0 +1,413 @@
+import asyncio
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+import asyncssh
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import display_config  # noqa: E402
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "hosts.cache"
+    monkeypatch.setattr(display_config, "KNOWN_HOSTS_CACHE", str(path))
+    return path
+
+
+def test_load_cached_hosts_missing(cache_path):
+    assert display_config.load_cached_hosts() is None
+
+
+def test_save_then_load_cached_hosts(cache_path):
+    display_config.save_cached_hosts(["10.0.0.2", "10.0.0.3"])
+    assert display_config.load_cached_hosts() == ["10.0.0.2", "10.0.0.3"]
+
+
+def test_load_cached_hosts_expired(cache_path):
+    display_config.save_cached_hosts(["10.0.0.2"])
+    stale = time.time() - display_config.KNOWN_HOSTS_MAX_AGE - 60
+    os.utime(cache_path, (stale, stale))
+    assert display_config.load_cached_hosts() is None
+
+
+def test_save_cached_hosts_empty_removes_cache(cache_path):
+    display_config.save_cached_hosts(["10.0.0.2"])
+    display_config.save_cached_hosts([])
+    assert not cache_path.exists()
+
+
+@pytest.fixture
+def fake_run(tmp_path, cache_path, monkeypatch):
+    """Run main() with the network replaced: scan_results answer pings, reachable accept SSH."""
+    calls = {"scans": 0, "deployed": [], "payloads": [], "tar_builds": 0, "key_loads": 0}
+    network = {"scan_results": [], "reachable": set()}
+    build_tar = display_config._build_tar
+
+    async def fake_scan(addresses, concurrent_tasks):
+        calls["scans"] += 1
+        return list(network["scan_results"])
+
+    async def fake_deploy(active_ips, payload, transferred_files, known_hosts):
+        calls["deployed"].append(list(active_ips))
+        calls["payloads"].append(payload)
+        return [ip for ip in active_ips if ip in network["reachable"]]
+
+    def counting_build_tar(local_dir, filenames):
+        calls["tar_builds"] += 1
+        return build_tar(local_dir, filenames)
+
+    async def fake_update_known_hosts(ips):
+        return False
+
+    def fake_load_known_hosts():
+        calls["key_loads"] += 1
+        return object()
+
+    monkeypatch.setattr(display_config, "LOCAL_DIR", str(tmp_path))
+    monkeypatch.setattr(display_config, "get_local_ip", lambda: "10.0.0.1")
+    monkeypatch.setattr(display_config, "get_gateway_ip", lambda: "10.0.0.254")
+    monkeypatch.setattr(display_config, "scan_active_ips", fake_scan)
+    monkeypatch.setattr(display_config, "deploy_all", fake_deploy)
+    monkeypatch.setattr(display_config, "_build_tar", counting_build_tar)
+    monkeypatch.setattr(display_config, "update_known_hosts", fake_update_known_hosts)
+    monkeypatch.setattr(display_config, "load_known_hosts", fake_load_known_hosts)
+
+    def run():
+        asyncio.run(display_config.main())
+        return calls
+
+    return network, run
+
+
+def test_cache_hit_keeps_scan_timestamp(cache_path, fake_run):
+    network, run = fake_run
+    display_config.save_cached_hosts(["10.0.0.2", "10.0.0.3"])
+    scanned_at = time.time() - 23 * 60 * 60
+    os.utime(cache_path, (scanned_at, scanned_at))
+    network["reachable"] = {"10.0.0.2", "10.0.0.3"}
+
+    calls = run()
+
+    assert calls["scans"] == 0
+    assert calls["deployed"] == [["10.0.0.2", "10.0.0.3"]]
+    assert os.path.getmtime(cache_path) == pytest.approx(scanned_at)
+
+
+def test_unreachable_cached_device_triggers_rescan(cache_path, fake_run):
+    network, run = fake_run
+    display_config.save_cached_hosts(["10.0.0.2", "10.0.0.3"])
+    network["scan_results"] = ["10.0.0.1", "10.0.0.2", "10.0.0.4"]
+    network["reachable"] = {"10.0.0.2", "10.0.0.4"}
+
+    calls = run()
+
+    assert calls["scans"] == 1
+    assert calls["deployed"] == [["10.0.0.2", "10.0.0.3"], ["10.0.0.4"]]
+    assert display_config.load_cached_hosts() == ["10.0.0.2", "10.0.0.4"]
+
+
+def test_rescan_reuses_payload_and_host_keys(cache_path, fake_run, monkeypatch):
+    network, run = fake_run
+    messages = []
+    monkeypatch.setattr(display_config, "progress", messages.append)
+    display_config.save_cached_hosts(["10.0.0.2", "10.0.0.3"])
+    network["scan_results"] = ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    network["reachable"] = {"10.0.0.2", "10.0.0.4"}
+
+    calls = run()
+
+    assert calls["deployed"] == [["10.0.0.2", "10.0.0.3"], ["10.0.0.3", "10.0.0.4"]]
+    assert calls["tar_builds"] == 1
+    assert calls["key_loads"] == 1
+    assert calls["payloads"][0] is calls["payloads"][1]
+    assert any("completed for 3 devices" in msg for msg in messages)
+
+
+def test_update_known_hosts_aborts_without_ssh_keyscan(tmp_path, monkeypatch):
+    monkeypatch.setattr(display_config, "SSH_KNOWN_HOSTS", str(tmp_path / "deploy_known_hosts"))
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    with pytest.raises(SystemExit):
+        asyncio.run(display_config.update_known_hosts(["10.0.0.2"]))
+
+
+def test_missing_local_dir_is_reported_on_console(tmp_path, monkeypatch):
+    messages = []
+    monkeypatch.setattr(display_config, "LOCAL_DIR", str(tmp_path / "missing"))
+    monkeypatch.setattr(display_config, "progress", messages.append)
+
+    with pytest.raises(SystemExit):
+        asyncio.run(display_config.main())
+
+    assert any("missing" in msg for msg in messages)
+
+
+ROUTE_HEADER = "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+
+
+def test_get_gateway_ip_reads_default_route(tmp_path):
+    route_table = tmp_path / "route"
+    route_table.write_text(
+        ROUTE_HEADER
+        + "eth0\t000200C0\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0\n"
+        + "eth0\t00000000\t010200C0\t0003\t0\t0\t0\t00000000\t0\t0\t0\n"
+    )
+    assert display_config.get_gateway_ip(str(route_table)) == "192.0.2.1"
+
+
+def test_get_gateway_ip_skips_default_route_without_gateway(tmp_path):
+    route_table = tmp_path / "route"
+    route_table.write_text(
+        ROUTE_HEADER
+        + "wg0\t00000000\t00000000\t0001\t0\t0\t0\t00000000\t0\t0\t0\n"
+    )
+    assert display_config.get_gateway_ip(str(route_table)) is None
+
+
+class _DeniedSocket:
+    def __init__(self, privileged):
+        raise display_config.SocketPermissionError(privileged)
+
+
+def test_scan_falls_back_to_raw_sockets(monkeypatch):
+    modes = []
+
+    class RawOnlySocket:
+        def __init__(self, privileged):
+            if not privileged:
+                raise display_config.SocketPermissionError(privileged)
+
+        def close(self):
+            pass
+
+    async def fake_multiping(addresses, privileged, **kwargs):
+        modes.append(privileged)
+        return []
+
+    monkeypatch.setattr(display_config, "ICMPv4Socket", RawOnlySocket)
+    monkeypatch.setattr(display_config, "async_multiping", fake_multiping)
+
+    assert asyncio.run(display_config.scan_active_ips(iter(["10.0.0.2"]), 1)) == []
+    assert modes == [True]
+
+
+def test_scan_without_icmp_permission_aborts_with_message(monkeypatch):
+    messages = []
+    monkeypatch.setattr(display_config, "ICMPv4Socket", _DeniedSocket)
+    monkeypatch.setattr(display_config, "progress", messages.append)
+
+    with pytest.raises(SystemExit):
+        asyncio.run(display_config.scan_active_ips(iter(["10.0.0.2"]), 1))
+
+    assert any("ping_group_range" in msg for msg in messages)
+
+
+def test_unreachable_device_does_not_wait_for_handshake_slot(monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        closed_port = probe.getsockname()[1]
+    monkeypatch.setattr(display_config, "SSH_PORT", closed_port)
+    monkeypatch.setattr(display_config, "progress", lambda msg: None)
+
+    async def deploy_with_slots_exhausted():
+        connect_semaphore = asyncio.Semaphore(0)
+        return await asyncio.wait_for(
+            display_config.send_files_and_execute(
+                "127.0.0.1", asyncio.Semaphore(1), connect_semaphore, b"", [], None
+            ),
+            timeout=5,
+        )
+
+    assert asyncio.run(deploy_with_slots_exhausted()) is False
+
+
+class _ShellServer(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return password == display_config.REMOTE_PASSWORD
+
+
+async def _run_locally(process):
+    """Execute the requested command with a local shell, wired to the SSH channel."""
+    proc = await asyncio.create_subprocess_shell(
+        process.command, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+
+    async def feed_stdin():
+        while data := await process.stdin.read(65536):
+            proc.stdin.write(data)
+            await proc.stdin.drain()
+        proc.stdin.close()
+
+    feeder = asyncio.ensure_future(feed_stdin())
+    await process.redirect(stdout=proc.stdout, stderr=proc.stderr)
+    exit_status = await proc.wait()
+    feeder.cancel()
+    process.exit(exit_status)
+
+
+@pytest.fixture
+def deploy_to_local_server(tmp_path, monkeypatch):
+    """Run send_files_and_execute against an in-process asyncssh server; returns (result, console, logs)."""
+    console, logs = [], []
+    monkeypatch.setattr(display_config, "progress", console.append)
+    monkeypatch.setattr(display_config, "log_message", lambda msg, error=False: logs.append((error, msg)))
+
+    def deploy(files):
+        local_dir = tmp_path / "files"
+        local_dir.mkdir(exist_ok=True)
+        for name, content in files.items():
+            (local_dir / name).write_text(content)
+        names = sorted(files)
+        payload = display_config._build_tar(str(local_dir), names)
+
+        async def scenario():
+            host_key = asyncssh.generate_private_key("ssh-ed25519")
+            server = await asyncssh.create_server(
+                _ShellServer, "127.0.0.1", 0, server_host_keys=[host_key],
+                process_factory=_run_locally, encoding=None
+            )
+            port = server.sockets[0].getsockname()[1]
+            monkeypatch.setattr(display_config, "SSH_PORT", port)
+            known_hosts = asyncssh.import_known_hosts(
+                f"[127.0.0.1]:{port} {host_key.export_public_key().decode()}"
+            )
+            try:
+                return await display_config.send_files_and_execute(
+                    "127.0.0.1", asyncio.Semaphore(1), asyncio.Semaphore(1), payload, names, known_hosts
+                )
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        return asyncio.run(scenario()), console, logs
+
+    return deploy
+
+
+def test_failed_upload_reports_remote_tar_error(tmp_path, monkeypatch, deploy_to_local_server):
+    monkeypatch.setattr(display_config, "REMOTE_DIR", str(tmp_path / "no-such-dir") + "/")
+
+    reachable, console, logs = deploy_to_local_server({display_config.TARGET_FILE_TO_RUN: "echo hi\n"})
+
+    assert reachable is True
+    failure = [msg for error, msg in logs if error]
+    assert len(failure) == 1
+    assert "File transfer failed" in failure[0]
+    assert "no-such-dir" in failure[0]
+    assert failure[0] in console
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = list(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def read(self, n):
+        return self._chunks.pop(0)[:n] if self._chunks else ""
+
+
+class _FakeProcess:
+    def __init__(self, stdout, stderr):
+        self.stdout = _FakeStream(stdout)
+        self.stderr = _FakeStream(stderr)
+        self.waited = False
+
+    async def wait(self):
+        self.waited = True
+
+
+def test_stream_output_logs_stdout_and_keeps_stderr_tail(monkeypatch):
+    logs = []
+    monkeypatch.setattr(display_config, "log_message", lambda msg, error=False: logs.append(msg))
+    stderr = ["a" * 65536, "b" * 65536, "c" * 100]
+    process = _FakeProcess(["first\n", "\n", "second\n"], stderr)
+
+    tail = asyncio.run(display_config.stream_output("10.0.0.2", process))
+
+    assert logs == ["10.0.0.2: OUTPUT → first", "10.0.0.2: OUTPUT → second"]
+    assert tail == ("b" * 65536 + "c" * 100)[-65536:]
+    assert len(tail) == 65536
+    assert process.waited
+
+
+def test_script_failure_is_reported_as_error(tmp_path, monkeypatch, deploy_to_local_server):
+    remote_dir = tmp_path / "remote"
+    remote_dir.mkdir()
+    monkeypatch.setattr(display_config, "REMOTE_DIR", str(remote_dir) + "/")
+
+    reachable, console, logs = deploy_to_local_server(
+        {display_config.TARGET_FILE_TO_RUN: "echo progress\necho broken >&2\nexit 3\n"}
+    )
+
+    assert reachable is True
+    assert (False, "127.0.0.1: OUTPUT → progress") in logs
+    assert (True, "127.0.0.1: ⚠ Script error (exit 3): broken") in logs
+    assert (remote_dir / display_config.TARGET_FILE_TO_RUN).exists()  # no cleanup after failure
+
+
+def test_script_success_cleans_up_and_logs_stderr(tmp_path, monkeypatch, deploy_to_local_server):
+    remote_dir = tmp_path / "remote"
+    remote_dir.mkdir()
+    monkeypatch.setattr(display_config, "REMOTE_DIR", str(remote_dir) + "/")
+
+    reachable, console, logs = deploy_to_local_server(
+        {display_config.TARGET_FILE_TO_RUN: "echo done\necho warning >&2\n", "calibration.dat": "x"}
+    )
+
+    assert reachable is True
+    assert "127.0.0.1: ✅ Script executed successfully." in console
+    assert (False, "127.0.0.1: STDERR → warning") in logs
+    assert not any(error for error, msg in logs)
+    assert list(remote_dir.iterdir()) == []
+
+
+class _RecordingStdout:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+
+def test_drain_progress_batches_and_flushes_before_sentinel(monkeypatch):
+    out = _RecordingStdout()
+    progress_q = queue.SimpleQueue()
+    monkeypatch.setattr(display_config, "PROGRESS_Q", progress_q)
+    monkeypatch.setattr(sys, "stdout", out)
+    messages = [f"message {i}" for i in range(display_config.PROGRESS_BATCH * 2 + 5)]
+    for msg in messages:
+        progress_q.put(msg)
+    progress_q.put(None)
+
+    writer = threading.Thread(target=display_config._drain_progress, daemon=True)
+    writer.start()
+    writer.join(timeout=5)
+
+    assert not writer.is_alive()
+    assert "".join(out.writes) == "\n".join(messages) + "\n"
+    assert len(out.writes) == 3
+    assert all(write.count("\n") <= display_config.PROGRESS_BATCH for write in out.writes)